@@ -1,40 +1,77 @@
+import re
+import sys
+
 ###########################
 # CONSTANTS
 ###########################
 DIGITS = '0123456789'
 LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_'
+IDENT_CHARS = LETTERS + DIGITS
 
 #################################
-# TOKEN TYPES
+# CHARACTER CLASSES
 #################################
-TT_INT        = 'INT'
-TT_FLOAT      = 'FLOAT'
-TT_PLUS       = 'PLUS'
-TT_MINUS      = 'MINUS'
-TT_MUL        = 'MUL'
-TT_DIV        = 'DIV'
-TT_LPAREN     = 'LPAREN'
-TT_RPAREN     = 'RPAREN'
-TT_EQ         = 'EQ'
-TT_IDENTIFIER = 'IDENTIFIER'
+CC_DIGIT  = 1
+CC_LETTER = 2
+CC_DOT    = 4
+CC_SPACE  = 8
+CC_EOF    = 16
+
+# One byte of class bits per Latin-1 code point, indexed by byte value
+CHAR_CLASS = bytearray(256)
+for c in DIGITS:
+    CHAR_CLASS[ord(c)] |= CC_DIGIT
+for c in LETTERS:
+    CHAR_CLASS[ord(c)] |= CC_LETTER
+for c in ' \t':
+    CHAR_CLASS[ord(c)] |= CC_SPACE
+CHAR_CLASS[ord('.')] |= CC_DOT
+del c
+
+# Whole-lexeme pattern, matched in place against the source text
+_match_identifier = re.compile(f'[{re.escape(LETTERS)}][{re.escape(IDENT_CHARS)}]*').match
 
 #################################
-# TOKEN CLASS
+# TOKEN TYPES
 #################################
-class Token:
-    def __init__(self, type_, value=None):
-        self.type = type_
-        self.value = value
-
-    def __repr__(self):
-        if self.value is not None:
-            return f'{self.type}:{self.value}'
-        return f'{self.type}'
+TT_INT        = 0
+TT_FLOAT      = 1
+TT_PLUS       = 2
+TT_MINUS      = 3
+TT_MUL        = 4
+TT_DIV        = 5
+TT_LPAREN     = 6
+TT_RPAREN     = 7
+TT_EQ         = 8
+TT_IDENTIFIER = 9
+TT_EOF        = 10
+
+# Display names, indexed by token type
+TT_NAMES = [
+    'INT', 'FLOAT', 'PLUS', 'MINUS', 'MUL', 'DIV',
+    'LPAREN', 'RPAREN', 'EQ', 'IDENTIFIER', 'EOF',
+]
+
+# Token type sets as bitmasks, tested with (1 << type) & MASK
+TT_NUMBER_MASK = (1 << TT_INT) | (1 << TT_FLOAT)
+
+# Single-character operators and their token types
+SINGLE = {
+    '+': TT_PLUS,
+    '-': TT_MINUS,
+    '*': TT_MUL,
+    '/': TT_DIV,
+    '=': TT_EQ,
+    '(': TT_LPAREN,
+    ')': TT_RPAREN,
+}
 
 #################################
 # ERROR CLASSES
 #################################
 class Error:
+    __slots__ = ('pos', 'details')
+
     def __init__(self, pos, details):
         self.pos = pos
         self.details = details
@@ -46,6 +83,8 @@ class Error:
         return f'Error at position {self.pos}: {self.details}'
 
 class IllegalCharError(Error):
+    __slots__ = ()
+
     def __init__(self, pos, char):
         super().__init__(pos, f"Illegal character '{char}'")
 
@@ -55,8 +94,22 @@ class IllegalCharError(Error):
 class Lexer:
     def __init__(self, text):
         self.text = text
+        # The scan works on copies of the text, its bytes and its classes
+        # that all end in a sentinel, so it can read one past the last
+        # character without a bounds check
+        self._text = text + '\0'
+        # Characters outside Latin-1 become '?', which keeps one byte per
+        # character and classifies them as illegal
+        text_bytes = text.encode('latin-1', 'replace')
+        self._text_bytes = text_bytes + b'\0'
+        # Classify the whole text in one pass. The sentinel's class is
+        # appended rather than looked up, so a NUL typed in the input stays
+        # an illegal character
+        self.char_classes = text_bytes.translate(CHAR_CLASS) + bytes((CC_EOF,))
         self.pos = -1
         self.current_char = None
+        # Interned names of the identifiers seen so far
+        self._intern = {}
         self.advance()
 
     def advance(self):
@@ -64,182 +117,315 @@ class Lexer:
         self.current_char = self.text[self.pos] if self.pos < len(self.text) else None
 
     def make_tokens(self):
-        tokens = []
-
-        while self.current_char is not None:
-            if self.current_char in ' \t':
-                self.advance()
-            elif self.current_char in DIGITS:
-                tokens.append(self.make_number())
-            elif self.current_char in LETTERS:
-                tokens.append(self.make_identifier())
-            elif self.current_char == '+':
-                tokens.append(Token(TT_PLUS))
-                self.advance()
-            elif self.current_char == '-':
-                tokens.append(Token(TT_MINUS))
-                self.advance()
-            elif self.current_char == '*':
-                tokens.append(Token(TT_MUL))
-                self.advance()
-            elif self.current_char == '/':
-                tokens.append(Token(TT_DIV))
-                self.advance()
-            elif self.current_char == '=':
-                tokens.append(Token(TT_EQ))
-                self.advance()
-            elif self.current_char == '(':
-                tokens.append(Token(TT_LPAREN))
-                self.advance()
-            elif self.current_char == ')':
-                tokens.append(Token(TT_RPAREN))
-                self.advance()
+        # Tokens come back as two parallel sequences, a bytearray of types
+        # and a list of values (None for operators). Every token takes at
+        # least one character, so both are sized for the whole text up front
+        # and trimmed in place at the end; operators leave their preset None
+        # value untouched.
+        # The scan runs on locals; self.pos and self.current_char are only
+        # brought up to date when it stops
+        text = self._text
+        types = bytearray(len(text))
+        values = [None] * len(text)
+        count = 0
+        char_classes = self.char_classes
+        single = SINGLE
+        make_number = self.make_number
+        make_identifier = self.make_identifier
+        pos = self.pos
+
+        while True:
+            ch = text[pos]
+            type_ = single.get(ch)
+            if type_ is not None:
+                types[count] = type_
+                count += 1
+                pos += 1
+                continue
+
+            cls = char_classes[pos]
+            if cls & CC_SPACE:
+                pos += 1
+            elif cls & CC_DIGIT:
+                type_, value, pos = make_number(pos)
+                types[count] = type_
+                values[count] = value
+                count += 1
+            elif cls & CC_LETTER:
+                value, pos = make_identifier(pos)
+                types[count] = TT_IDENTIFIER
+                values[count] = value
+                count += 1
+            elif cls == CC_EOF:
+                break
             else:
-                pos = self.pos
-                char = self.current_char
+                self.pos = pos
                 self.advance()
-                return [], IllegalCharError(pos, char)
-
-        return tokens, None
-
-    def make_identifier(self):
-        id_str = ''
-        while self.current_char is not None and self.current_char in LETTERS + DIGITS:
-            id_str += self.current_char
-            self.advance()
-        return Token(TT_IDENTIFIER, id_str)
-
-    def make_number(self):
-        num_str = ''
-        dot_count = 0
-
-        while self.current_char is not None and self.current_char in DIGITS + '.':
-            if self.current_char == '.':
-                if dot_count == 1:
-                    break
-                dot_count += 1
-                num_str += '.'
-            else:
-                num_str += self.current_char
-            self.advance()
+                return (bytearray(), []), IllegalCharError(pos, ch)
 
-        if dot_count == 0:
-            return Token(TT_INT, int(num_str))
-        else:
-            return Token(TT_FLOAT, float(num_str))
+        del types[count:]
+        del values[count:]
+        self.pos = pos
+        self.current_char = None
+        return (types, values), None
+
+    def make_identifier(self, pos):
+        match = _match_identifier(self._text, pos)
+        id_str = match.group()
+
+        name = self._intern.get(id_str)
+        if name is None:
+            name = self._intern[id_str] = sys.intern(id_str)
+        return name, match.end()
+
+    def make_number(self, pos):
+        # Integers are the common case, so accumulate plain digits first and
+        # only take the float path when they stop at a '.'. Digits are
+        # folded into the value as they are scanned, so no substring is
+        # sliced out and parsed again
+        char_classes = self.char_classes
+        text_bytes = self._text_bytes
+        start = pos
+        value = text_bytes[pos] - 48
+        pos += 1
+        while char_classes[pos] & CC_DIGIT:
+            value = value * 10 + text_bytes[pos] - 48
+            pos += 1
+
+        if not char_classes[pos] & CC_DOT:
+            return TT_INT, value, pos
+
+        # Keep accumulating the fraction digits into the mantissa; int true
+        # division rounds correctly, so this matches float() on the literal
+        # whenever the result is in range. Past the float range it raises
+        # instead of giving inf, so leave that rare case to float()
+        pos += 1
+        scale = 1
+        while char_classes[pos] & CC_DIGIT:
+            value = value * 10 + text_bytes[pos] - 48
+            scale *= 10
+            pos += 1
+        try:
+            return TT_FLOAT, value / scale, pos
+        except OverflowError:
+            return TT_FLOAT, float(self._text[start:pos]), pos
 
 #################################
 # AST NODES
 #################################
 class NumberNode:
-    def __init__(self, tok):
-        self.tok = tok
+    __slots__ = ('type', 'value')
+
+    def __init__(self, type_, value):
+        self.type = type_
+        self.value = value
 
 class VarAccessNode:
-    def __init__(self, var_name_tok):
-        self.var_name_tok = var_name_tok
+    __slots__ = ('var_name',)
+
+    def __init__(self, var_name):
+        self.var_name = var_name
 
 class VarAssignNode:
-    def __init__(self, var_name_tok, value_node):
-        self.var_name_tok = var_name_tok
+    __slots__ = ('var_name', 'value_node')
+
+    def __init__(self, var_name, value_node):
+        self.var_name = var_name
         self.value_node = value_node
 
 class BinOpNode:
-    def __init__(self, left_node, op_tok, right_node):
+    __slots__ = ('left_node', 'op', 'right_node')
+
+    def __init__(self, left_node, op, right_node):
         self.left_node = left_node
-        self.op_tok = op_tok
+        self.op = op
         self.right_node = right_node
 
+class FlatBinOpNode:
+    # A left-associative chain of same-precedence operators, kept as
+    # operands[0] ops[0] operands[1] ops[1] ... instead of nested BinOpNodes
+    __slots__ = ('operands', 'ops')
+
+    def __init__(self, operands, ops):
+        self.operands = operands
+        self.ops = ops
+
 #################################
 # PARSER
 #################################
+# Binding power of each token type as a binary operator, indexed by type;
+# higher binds tighter and 0 means it is not an operator
+PREC = [0] * len(TT_NAMES)
+PREC[TT_PLUS] = PREC[TT_MINUS] = 1
+PREC[TT_MUL] = PREC[TT_DIV] = 2
+
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, types, values):
+        self.types = types
+        self.values = values
         self.tok_idx = -1
         self.advance()
 
     def advance(self):
         self.tok_idx += 1
-        self.current_tok = self.tokens[self.tok_idx] if self.tok_idx < len(self.tokens) else None
-        return self.current_tok
+        self.current_type = self.types[self.tok_idx] if self.tok_idx < len(self.types) else TT_EOF
+        return self.current_type
 
     def parse(self):
-        if self.current_tok is None:
+        if self.current_type == TT_EOF:
             return None
         result = self.statement()
         return result
 
     def statement(self):
-        if self.current_tok.type == TT_IDENTIFIER:
-            var_name = self.current_tok
+        if self.current_type == TT_IDENTIFIER:
+            var_name = self.values[self.tok_idx]
             self.advance()
-            if self.current_tok is not None and self.current_tok.type == TT_EQ:
+            if self.current_type == TT_EQ:
                 self.advance()
                 expr = self.expr()
                 return VarAssignNode(var_name, expr)
         return self.expr()
 
     def expr(self):
-        return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
-
-    def term(self):
-        return self.bin_op(self.factor, (TT_MUL, TT_DIV))
+        return self.parse_expr(self.factor(), 1)
 
     def factor(self):
-        tok = self.current_tok
+        type_ = self.current_type
 
-        if tok.type in (TT_INT, TT_FLOAT):
+        if (1 << type_) & TT_NUMBER_MASK:
+            value = self.values[self.tok_idx]
             self.advance()
-            return NumberNode(tok)
-        elif tok.type == TT_IDENTIFIER:
+            return NumberNode(type_, value)
+        elif type_ == TT_IDENTIFIER:
+            var_name = self.values[self.tok_idx]
             self.advance()
-            return VarAccessNode(tok)
-        elif tok.type == TT_LPAREN:
+            return VarAccessNode(var_name)
+        elif type_ == TT_LPAREN:
             self.advance()
             expr = self.expr()
-            if self.current_tok is not None and self.current_tok.type == TT_RPAREN:
+            if self.current_type == TT_RPAREN:
                 self.advance()
                 return expr
             else:
                 raise Exception("Expected ')'")
+        elif type_ == TT_EOF:
+            raise Exception("Unexpected end of input")
         else:
-            raise Exception(f"Unexpected token: {tok}")
+            # Numbers and identifiers are handled above, so only operators
+            # can end up here
+            raise Exception(f"Unexpected token: {TT_NAMES[type_]}")
+
+    def parse_expr(self, left, min_prec):
+        # Precedence climbing: operators of equal binding power are appended
+        # to one flat node in this loop, and the parser only recurses when a
+        # tighter operator follows the right operand
+        flat = None
+        flat_prec = 0
+        op = self.current_type
+        while PREC[op] >= min_prec:
+            prec = PREC[op]
+            self.advance()
+            right = self.factor()
 
-    def bin_op(self, func, ops):
-        left = func()
+            next_op = self.current_type
+            while PREC[next_op] > prec:
+                right = self.parse_expr(right, prec + 1)
+                next_op = self.current_type
 
-        while self.current_tok is not None and self.current_tok.type in ops:
-            op_tok = self.current_tok
-            self.advance()
-            right = func()
-            left = BinOpNode(left, op_tok, right)
+            if prec == flat_prec:
+                flat.operands.append(right)
+                flat.ops.append(op)
+            else:
+                left = flat = FlatBinOpNode([left, right], [op])
+                flat_prec = prec
+            op = next_op
 
         return left
 
 #################################
 # PARSE TREE PRINTER
 #################################
-def print_tree(node, indent='', last=True):
-    marker = '└── ' if last else '├── '
-
-    if isinstance(node, NumberNode):
-        print(indent + marker + f'Number({node.tok.value})')
-
-    elif isinstance(node, VarAccessNode):
-        print(indent + marker + f'Var({node.var_name_tok.value})')
-
-    elif isinstance(node, VarAssignNode):
-        print(indent + marker + '=')
-        indent += '    ' if last else '│   '
-        print_tree(VarAccessNode(node.var_name_tok), indent, False)
-        print_tree(node.value_node, indent, True)
-
-    elif isinstance(node, BinOpNode):
-        print(indent + marker + f'{node.op_tok.value}')
-        indent += '    ' if last else '│   '
-        print_tree(node.left_node, indent, False)
-        print_tree(node.right_node, indent, True)
+INDENT_UNIT_LAST = '    '
+INDENT_UNIT_CONT = '│   '
+
+# Indents are keyed by ancestor mask: a leading 1 bit followed by one bit
+# per ancestor, root first, set when that ancestor was a last child. Each
+# print_tree call keeps its own cache of them, dropped when it returns
+def _indent(indents, mask):
+    indent = indents.get(mask)
+    if indent is None:
+        unit = INDENT_UNIT_LAST if mask & 1 else INDENT_UNIT_CONT
+        indent = indents[mask] = _indent(indents, mask >> 1) + unit
+    return indent
+
+# Output pieces are gathered in a list and handed to writelines in batches
+# of this size, so a large tree neither pays for a print per line nor gets
+# copied into one joined string
+FLUSH_PARTS = 1024
+
+def print_tree(node):
+    parts = []
+    _print_tree(node, parts, {1: ''}, 1, True)
+    sys.stdout.writelines(parts)
+
+def _print_tree(node, parts, indents, mask, last):
+    handler = HANDLERS.get(type(node))
+    if handler is not None:
+        handler(node, parts, indents, mask, last)
+    if len(parts) >= FLUSH_PARTS:
+        sys.stdout.writelines(parts)
+        parts.clear()
+
+def _print_number(node, parts, indents, mask, last):
+    parts.append(_indent(indents, mask))
+    parts.append('└── ' if last else '├── ')
+    parts.append(f'Number({node.value})\n')
+
+def _print_var_access(node, parts, indents, mask, last):
+    parts.append(_indent(indents, mask))
+    parts.append('└── ' if last else '├── ')
+    parts.append(f'Var({node.var_name})\n')
+
+def _print_var_assign(node, parts, indents, mask, last):
+    parts.append(_indent(indents, mask))
+    parts.append('└── =\n' if last else '├── =\n')
+    mask = (mask << 1) | last
+    _print_tree(VarAccessNode(node.var_name), parts, indents, mask, False)
+    _print_tree(node.value_node, parts, indents, mask, True)
+
+def _print_bin_op(node, parts, indents, mask, last):
+    parts.append(_indent(indents, mask))
+    parts.append('└── ' if last else '├── ')
+    parts.append(f'{TT_NAMES[node.op]}\n')
+    mask = (mask << 1) | last
+    _print_tree(node.left_node, parts, indents, mask, False)
+    _print_tree(node.right_node, parts, indents, mask, True)
+
+def _print_flat_bin_op(node, parts, indents, mask, last):
+    # Prints the same tree as the equivalent left-nested BinOpNode chain,
+    # last operator on top, by walking the lists instead of recursing
+    is_last = last
+    for op in reversed(node.ops):
+        parts.append(_indent(indents, mask))
+        parts.append('└── ' if is_last else '├── ')
+        parts.append(f'{TT_NAMES[op]}\n')
+        mask = (mask << 1) | is_last
+        is_last = False
+
+    operands = node.operands
+    _print_tree(operands[0], parts, indents, mask, False)
+    for i in range(1, len(operands)):
+        _print_tree(operands[i], parts, indents, mask, True)
+        mask >>= 1
+
+HANDLERS = {
+    NumberNode: _print_number,
+    VarAccessNode: _print_var_access,
+    VarAssignNode: _print_var_assign,
+    BinOpNode: _print_bin_op,
+    FlatBinOpNode: _print_flat_bin_op,
+}
 
 #################################
 # RUN FUNCTION
@@ -250,7 +436,7 @@ def run(text):
     if error:
         return None, error
 
-    parser = Parser(tokens)
+    parser = Parser(*tokens)
     ast = parser.parse()
     return ast, None
 